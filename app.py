@@ -1,20 +1,18 @@
-import logging
 import streamlit as st
-import re
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import time
+import re
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import io
 import tempfile
 from pathlib import Path
 from openai import OpenAI
-from pptx import Presentation
-from pptx.enum.text import PP_ALIGN
-from pptx.util import Inches, Pt
-from pptx.enum.text import MSO_VERTICAL_ANCHOR
-from script import PowerPointGenerator, Config
+from script import PowerPointGenerator, Config, SafeFilename, setup_logging
 from bs4 import BeautifulSoup
 import markdown  
-import tempfile  
-from question_utils import generate_question_paper  
+from question_utils import generate_question_paper, iter_microskills  
 import pandas as pd
 from auth import sign_up_user, verify_user, logout
 import ssl
@@ -42,6 +40,10 @@ Now generate the Canvas (1 to 5 slides starting from Slide {slide_start}) for th
 {microskill_title} — {microskill_details}
 """
 
+_SLIDE_NUMBER_RE = re.compile(r"(# Slide\s*)\d+")
+MAX_PARALLEL_REQUESTS = 4
+REQUEST_GAP_SECONDS = 0.5
+
 # ===== STREAMLIT APP CONFIGURATION =====
 st.set_page_config(
     page_title="Training PPT Generator",
@@ -51,11 +53,16 @@ st.set_page_config(
 )
 
 # ===== HELPER FUNCTIONS =====
-@st.cache_data
+@st.cache_resource
+def get_openai_client(api_key):
+    """One OpenAI client per API key, so its pooled HTTP connections are reused across calls"""
+    return OpenAI(api_key=api_key)
+
+@st.cache_data(show_spinner=False)
 def query_openai(prompt, api_key):
-    """Query OpenAI API with caching"""
+    """Query OpenAI API with caching; no spinner, since worker threads call it concurrently"""
     try:
-        client = OpenAI(api_key=api_key)
+        client = get_openai_client(api_key)
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
@@ -69,6 +76,11 @@ def query_openai(prompt, api_key):
     except Exception as e:
         return None, str(e)
 
+@st.cache_resource
+def load_watermark():
+    """Read the watermark image once per process instead of on every rerun"""
+    return (Path(__file__).parent / "assets" / "watermark.jpg").read_bytes()
+
 def parse_table(lines):
     """Parse markdown table lines into data structure"""
     table_data = []
@@ -150,36 +162,73 @@ def parse_table(lines):
 
 #     return prs, notes_out
 
+def script_thread_executor(max_workers):
+    """Thread pool whose workers are attached to the current script run's context"""
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    )
+
+def renumber_slides(markdown_content, start):
+    """Rewrite '# Slide N' headings to count on from start; returns the text and the next number"""
+    counter = itertools.count(start)
+    text = _SLIDE_NUMBER_RE.sub(lambda m: f"{m.group(1)}{next(counter)}", markdown_content)
+    return text, next(counter)
+
 def generate_ppt_files(job_role, expertise, core_skill, microskills_text, api_key, progress_callback=None):
     """Generate PPT and notes files from inputs"""
-    all_markdown = []
-    slide_count = 1
-    total_lines = len([line for line in microskills_text.strip().split('\n') if '|' in line])
-    
-    for i, line in enumerate(microskills_text.strip().split('\n')):
-        if "|" not in line:
-            continue
-        
-        if progress_callback:
-            progress_callback(f"Processing micro-skill {i+1} of {total_lines}...", (i+1) / total_lines)
-        
-        title, details = line.strip().split("|", 1)
-        prompt = PROMPT_TEMPLATE.format(
+    microskills = list(iter_microskills(microskills_text))
+
+    # Every canvas is requested numbered from Slide 1 so the calls are independent
+    # of each other; the numbering is made continuous once all of them are back.
+    prompts = [
+        PROMPT_TEMPLATE.format(
             job_role=job_role,
             expertise=expertise,
             core_skill=core_skill,
-            microskill_title=title.strip(),
-            microskill_details=details.strip(),
-            slide_start=slide_count
+            microskill_title=title,
+            microskill_details=details,
+            slide_start=1
         )
-        
-        markdown_content, error = query_openai(prompt, api_key)
-        if error:
-            return None, None, None, error
+        for title, details in microskills
+    ]
+
+    gate = threading.Lock()
+    next_start = 0.0
+
+    def fetch(prompt):
+        nonlocal next_start
+        # Rate limiting: keep request starts 0.5s apart across the worker threads
+        with gate:
+            remaining = next_start - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            next_start = time.monotonic() + REQUEST_GAP_SECONDS
+        return query_openai(prompt, api_key)
+
+    # Duplicate micro-skill lines give identical prompts; request each prompt once
+    responses = dict.fromkeys(prompts)
+    total_requests = len(responses)
+    executor = script_thread_executor(MAX_PARALLEL_REQUESTS)
+    try:
+        futures = {executor.submit(fetch, prompt): prompt for prompt in responses}
+        # Progress is reported from the script thread as responses arrive
+        for done, future in enumerate(as_completed(futures), 1):
+            markdown_content, error = future.result()
+            if error:
+                return None, None, None, error
+            responses[futures[future]] = markdown_content
+            if progress_callback:
+                progress_callback(f"Processing micro-skill {done} of {total_requests}...", done / total_requests)
+    finally:
+        executor.shutdown(cancel_futures=True)
 
-        slide_count += markdown_content.count("# Slide")
+    all_markdown = []
+    slide_count = 1
+    for prompt in prompts:
+        markdown_content, slide_count = renumber_slides(responses[prompt], slide_count)
         all_markdown.append(markdown_content)
-        time.sleep(0.5)  # Rate limiting
 
     full_markdown = "\n\n".join(all_markdown)
 
@@ -196,20 +245,25 @@ def generate_ppt_files(job_role, expertise, core_skill, microskills_text, api_ke
         progress_callback("Converting to PowerPoint...", 0.9)
 
     # Initialize generator with your existing style logic
-    generator = PowerPointGenerator(Config(), logging.getLogger("pptgen"))
+    generator = PowerPointGenerator(Config(), setup_logging())
 
     # Generate PowerPoint into a temp path
-    ppt_path = Path(tempfile.mktemp(suffix=".pptx"))
+    # NamedTemporaryFile reserves a unique name atomically, unlike the racy mktemp()
+    with tempfile.NamedTemporaryFile(prefix="training_", suffix=".pptx", delete=False) as tmp:
+        ppt_path = Path(tmp.name)
     success = generator.create_enhanced_presentation(content_div, ppt_path, title=core_skill)
 
     if not success:
+        ppt_path.unlink(missing_ok=True)  # NamedTemporaryFile left the reserved file on disk
         return None, None, None, "PowerPoint generation failed."
 
-    prs = Presentation(ppt_path)
-    notes_out = [f"Slide {i}: {n}" for i, n in generator.speaker_notes_txt]
+    # Hand back the saved file's bytes; re-opening it with python-pptx only to save it again is wasted work
+    ppt_bytes = ppt_path.read_bytes()
+    ppt_path.unlink(missing_ok=True)
+    notes_out = [f"Slide {i}: {n}" for i, n in generator.speaker_notes]
     
         
-    return prs, full_markdown, notes_out, None
+    return ppt_bytes, full_markdown, notes_out, None
 
 def show_auth_ui():
     st.markdown("## ")  # vertical spacing
@@ -222,10 +276,8 @@ def show_auth_ui():
             
 
             # --- All form content inside this box ---
-            from pathlib import Path
-            watermark_path = str(Path(__file__).parent / "assets" / "watermark.jpg")
             st.markdown("<div style='display:flex; justify-content:center; align-items:center; margin-bottom:10px;'>", unsafe_allow_html=True)
-            st.image(watermark_path, width=180)
+            st.image(load_watermark(), width=180)
             st.markdown("</div>", unsafe_allow_html=True)
             st.markdown("<h2 style='text-align:center; color:#2b7cff; margin-bottom:0;'>Training PPT Generator</h2>", unsafe_allow_html=True)
             st.markdown("<p style='text-align:center; font-size:18px; color:#2b7cff;'>Please log in or register</p>", unsafe_allow_html=True)
@@ -320,11 +372,10 @@ def main():
         # Preview parsed micro-skills
         if microskills_text:
             st.subheader("📝 Parsed Micro-Skills Preview")
-            parsed_skills = []
-            for line in microskills_text.strip().split('\n'):
-                if '|' in line:
-                    title, details = line.strip().split('|', 1)
-                    parsed_skills.append({"Title": title.strip(), "Details": details.strip()})
+            parsed_skills = [
+                {"Title": title, "Details": details}
+                for title, details in iter_microskills(microskills_text)
+            ]
             
             if parsed_skills:
                 st.dataframe(parsed_skills, use_container_width=True)
@@ -388,7 +439,7 @@ def main():
         try:
             if generate_ppt:
                 with st.spinner("🔄 Generating your presentation..."):
-                    prs, full_markdown, notes_out, error = generate_ppt_files(
+                    ppt_bytes, full_markdown, notes_out, error = generate_ppt_files(
                         job_role, expertise, core_skill, microskills_text, api_key, update_progress
                     )
 
@@ -399,12 +450,9 @@ def main():
                     update_progress("Finalizing files...", 1.0)
 
                     # Create downloadable files and store in session_state
-                    ppt_buffer = io.BytesIO()
-                    prs.save(ppt_buffer)
-                    ppt_buffer.seek(0)
                     notes_content = ''.join(notes_out)
 
-                    st.session_state['ppt_buffer'] = ppt_buffer.getvalue()
+                    st.session_state['ppt_buffer'] = ppt_bytes
                     st.session_state['notes_content'] = notes_content
                     st.session_state['full_markdown'] = full_markdown
                     st.session_state['last_core_skill'] = core_skill
@@ -418,7 +466,8 @@ def main():
 
             if generate_qp:
                 with st.spinner("📝 Generating your question paper..."):
-                    df, error = generate_question_paper(microskills_text, query_openai, api_key)
+                    with script_thread_executor(2) as executor:
+                        df, error = generate_question_paper(microskills_text, query_openai, api_key, executor)
                     if error:
                         st.error(f"❌ {error}")
                         st.session_state['question_excel_buffer'] = None
@@ -450,14 +499,16 @@ def main():
     ) or st.session_state.get('question_excel_buffer')
     if any_download:
         cols = st.columns(4)
-        core_skill_for_file = st.session_state.get('last_core_skill', 'presentation')
+        core_skill_for_file = SafeFilename.sanitize(
+            st.session_state.get('last_core_skill') or 'presentation', Config().max_filename_length
+        )
         col_idx = 0
         if st.session_state.get('ppt_buffer') and st.session_state.get('notes_content') and st.session_state.get('full_markdown'):
             with cols[col_idx]:
                 st.download_button(
                     label="📄 Download PowerPoint",
                     data=st.session_state['ppt_buffer'],
-                    file_name=f"{core_skill_for_file.replace(' ', '_')}_training.pptx",
+                    file_name=f"{core_skill_for_file}_training.pptx",
                     mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
                 )
             col_idx += 1
@@ -465,7 +516,7 @@ def main():
                 st.download_button(
                     label="📝 Download Speaker Notes",
                     data=st.session_state['notes_content'],
-                    file_name=f"{core_skill_for_file.replace(' ', '_')}_notes.txt",
+                    file_name=f"{core_skill_for_file}_notes.txt",
                     mime="text/plain"
                 )
             col_idx += 1
@@ -473,7 +524,7 @@ def main():
                 st.download_button(
                     label="📋 Download Markdown",
                     data=st.session_state['full_markdown'],
-                    file_name=f"{core_skill_for_file.replace(' ', '_')}_canvas.md",
+                    file_name=f"{core_skill_for_file}_canvas.md",
                     mime="text/markdown"
                 )
             col_idx += 1
@@ -482,7 +533,7 @@ def main():
                 st.download_button(
                     label="📥 Download Question Paper (Excel)",
                     data=st.session_state['question_excel_buffer'],
-                    file_name=f"{core_skill_for_file.replace(' ', '_')}_questions.xlsx",
+                    file_name=f"{core_skill_for_file}_questions.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
 
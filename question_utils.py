@@ -2,7 +2,6 @@
 
 import re
 import pandas as pd
-import time
 from io import StringIO
 
 QUESTION_GEN_PROMPT = """
@@ -31,14 +30,24 @@ Questions:
 {raw_questions}
 """
 
-def generate_question_paper(microskills_text, query_openai, api_key):
+# Splits the raw model output in front of each "Q<n>." heading
+_QUESTION_SPLIT_RE = re.compile(r"\n(?=Q\d+\.)")
+_SEPARATOR_CHARS = frozenset("- ")
+
+def iter_microskills(microskills_text):
+    """Yield (title, details) for each 'title | details' line, stripped, skipping other lines"""
+    for line in microskills_text.strip().split('\n'):
+        if '|' in line:
+            title, detail = line.split('|', 1)
+            yield title.strip(), detail.strip()
+
+def generate_question_paper(microskills_text, query_openai, api_key, executor=None):
+    """Generate the question paper DataFrame; an optional executor formats the halves concurrently"""
     try:
         # Step 1: Format microskills block
-        microskills_block = ""
-        for line in microskills_text.strip().split('\n'):
-            if '|' in line:
-                title, detail = line.strip().split('|', 1)
-                microskills_block += f"{title.strip()}: {detail.strip()}\n"
+        microskills_block = "".join(
+            f"{title}: {detail}\n" for title, detail in iter_microskills(microskills_text)
+        )
 
         # Step 2: Generate raw questions
         question_prompt = QUESTION_GEN_PROMPT.format(microskills_block=microskills_block)
@@ -47,26 +56,35 @@ def generate_question_paper(microskills_text, query_openai, api_key):
             return None, f"Error generating questions: {error1}"
 
         # Step 3: Format questions to Excel table
-        question_list = re.split(r"\n(?=Q\d+\.)", raw_questions.strip())
+        question_list = _QUESTION_SPLIT_RE.split(raw_questions.strip())
         halves = (
             [question_list[:len(question_list)//2], question_list[len(question_list)//2:]]
             if len(question_list) > 20 else [question_list]
         )
 
+        format_prompts = [
+            EXCEL_FORMATTING_PROMPT.format(raw_questions='\n'.join(block).strip())
+            for block in halves
+        ]
+        # The halves are formatted independently, so the caller's executor can request them
+        # at the same time; it owns the threads and whatever context they need
+        if executor is not None and len(format_prompts) > 1:
+            responses = list(executor.map(lambda prompt: query_openai(prompt, api_key), format_prompts))
+        else:
+            responses = [query_openai(prompt, api_key) for prompt in format_prompts]
+
         dataframes = []
 
-        for block in halves:
-            raw_block = '\n'.join(block).strip()
-            format_prompt = EXCEL_FORMATTING_PROMPT.format(raw_questions=raw_block)
-            markdown_table, error2 = query_openai(format_prompt, api_key)
+        for markdown_table, error2 in responses:
             if error2:
                 return None, f"Error formatting table: {error2}"
 
             # Parse markdown table to DataFrame
-            md_lines = [line for line in markdown_table.splitlines() if line.strip().startswith("|")]
-            md_lines = [line for line in md_lines if not set(line.replace("|", "").strip()) <= {"-", " "}]
-
-            clean_md = "\n".join(md_lines)
+            # Keep table rows, minus the |---|---| separator, in one pass over the lines
+            clean_md = "\n".join(
+                line for line in markdown_table.splitlines()
+                if line.lstrip().startswith("|") and not set(line.replace("|", "").strip()) <= _SEPARATOR_CHARS
+            )
             df = pd.read_csv(StringIO(clean_md), sep="|", engine="python", skipinitialspace=True)
             df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
             for col in ["SerialNo", "CorrectOption", "PositiveMark", "NegativeMark"]:
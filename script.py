@@ -1,18 +1,81 @@
+import io
 import logging
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Iterable, FrozenSet, Iterator, NamedTuple, Optional
 from pptx import Presentation
-from pptx.util import Inches, Pt, Cm
+from pptx.util import Inches, Pt
 from pptx.oxml.xmlchemy import OxmlElement
 from pptx.oxml.ns import qn
-from pptx.enum.text import MSO_AUTO_SIZE, MSO_VERTICAL_ANCHOR, PP_ALIGN
+from lxml.etree import SubElement
+from pptx.opc.packuri import PackURI
+from pptx.enum.text import MSO_AUTO_SIZE, MSO_VERTICAL_ANCHOR
 from pptx.dml.color import RGBColor
-from bs4 import BeautifulSoup, NavigableString
+from bs4 import NavigableString
 from bs4.element import Tag
 import re
 import os
+import time
 
+# Patterns applied to every element while walking the canvas HTML
+_SPEAKER_NOTES_RE = re.compile(r"speaker notes\s*:\s*", re.IGNORECASE)
+_SLIDE_PREFIX_RE = re.compile(r'^slide\s*\d+\s*:\s*', re.IGNORECASE)
+_SUBTITLE_PREFIX_RE = re.compile(r'^subtitle\s*:\s*', re.IGNORECASE)
+# '-', '•' or '·' markers, '1.' numbering and 'a.' lettering in a single alternation
+_BULLET_RE = re.compile(r'^\s*(?:[-•·]|\d+\.|[a-zA-Z]\.)\s+')
+
+# Tags _process_content_elements dispatches on, and the ones that make their
+# descendants part of a list item
+_CONTENT_TAGS = frozenset({
+    "h1", "h2", "h3", "h4", "h5", "h6",
+    "p", "ul", "ol", "table", "pre", "code",
+    "blockquote", "img", "span", "div"
+})
+_LIST_TAGS = frozenset({"ul", "ol", "li"})
+# Tags whose text is rendered whole elsewhere (slide title, table cell), so an
+# inline <code> inside them must not become a separate body paragraph
+_CODE_HOST_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6", "td", "th"})
+_NESTED_LIST_TAGS = frozenset({"ul", "ol"})
+
+# Fixed slide geometry, precomputed in EMU (360000 per cm, 914400 per inch)
+_BODY_LEFT = 457200       # 1.27 cm
+_BODY_TOP = 1900800       # 5.28 cm
+_BODY_WIDTH = 5806800     # 16.13 cm
+_BODY_HEIGHT = 3052800    # 8.48 cm
+_BODY_MARGIN_X = 90000    # 0.25 cm
+_BODY_MARGIN_Y = 46800    # 0.13 cm
+_TABLE_LEFT = 457200      # 0.5 in
+_TABLE_TOP = 1618488      # 1.77 in
+_TABLE_WIDTH = 8229600    # 9 in
+_MAX_TITLE_LENGTH = 100  # Including the "..." added to longer titles
+# Font sizes per font type, built once rather than per paragraph
+_FONT_SIZE_CODE = Pt(20)
+_FONT_SIZE_DEFAULT = Pt(24)
+_FONT_SIZE_HEADING = Pt(28)
+_FONT_SIZE_FALLBACK = Pt(22)
+_HEADER_FILL = RGBColor(68, 114, 196)
+_HEADER_TEXT = RGBColor(255, 255, 255)
+# Clark-notation names for the paragraph XML _append_paragraph builds,
+# resolved once instead of through qn() per paragraph
+_A_PPR = qn('a:pPr')
+_A_SPC_BEF = qn('a:spcBef')
+_A_SPC_AFT = qn('a:spcAft')
+_A_SPC_PTS = qn('a:spcPts')
+_A_BU_NONE = qn('a:buNone')
+_A_DEF_RPR = qn('a:defRPr')
+_A_LATIN = qn('a:latin')
+
+class FontFallbacks(NamedTuple):
+    """Font names per kind of slide text, read by attribute instead of dict key"""
+    default: str = 'Calibri'
+    code: str = 'Courier New'
+    math: str = 'Cambria Math'
+    fallback: str = 'Arial'
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Configuration settings for the converter"""
     max_wait_time: int = 30
@@ -20,72 +83,221 @@ class Config:
     retry_attempts: int = 3
     max_slide_content_length: int = 1000
     max_filename_length: int = 100
-    supported_image_formats: List[str] = None
-    font_fallbacks: Dict[str, str] = None
+    supported_image_formats: FrozenSet[str] = None
+    font_fallbacks: FontFallbacks = None
     
     def __post_init__(self):
+        # Frozen dataclass: defaults have to be installed via object.__setattr__
         if self.supported_image_formats is None:
-            self.supported_image_formats = ['.png', '.jpg', '.jpeg', '.gif', '.bmp']
+            object.__setattr__(self, 'supported_image_formats', frozenset({'.png', '.jpg', '.jpeg', '.gif', '.bmp'}))
         if self.font_fallbacks is None:
-            self.font_fallbacks = {
-                'default': 'Calibri',
-                'code': 'Courier New',
-                'math': 'Cambria Math',
-                'fallback': 'Arial'
-            }
+            object.__setattr__(self, 'font_fallbacks', FontFallbacks())
+
+
+def _is_fenced_code(code: Tag) -> bool:
+    """True for a <code> that is the only content of its <p>, as Python-Markdown emits fenced blocks"""
+    parent = code.parent
+    if parent is None or parent.name != "p":
+        return False
+    return all(
+        child is code or (isinstance(child, NavigableString) and not child.strip())
+        for child in parent.contents
+    )
+
+
+_CODE_CHARS_RE = re.compile(r'[{}();=<>]')
+
+
+@lru_cache(maxsize=2048)
+def _pick_font(text: str, fonts: FontFallbacks) -> str:
+    """Get appropriate font based on text content; bullets and cells repeat, so results are cached"""
+    # Check for non-ASCII characters (might need special font handling)
+    if not text.isascii():
+        return fonts.fallback
+
+    # Check for code-like content
+    if _CODE_CHARS_RE.search(text) and len(text.split()) < 10:
+        return fonts.code
+
+    return fonts.default
+
+
+@lru_cache(maxsize=1)
+def _default_template_bytes() -> bytes:
+    """Serialize python-pptx's built-in template once per process"""
+    buffer = io.BytesIO()
+    Presentation().save(buffer)
+    return buffer.getvalue()
+
+
+def _new_presentation() -> Presentation:
+    """Open a blank presentation from the cached template bytes"""
+    prs = Presentation(io.BytesIO(_default_template_bytes()))
+    _install_partname_counter(prs)
+    return prs
+
+
+def _install_partname_counter(prs: Presentation) -> None:
+    """Hand out partnames from a per-template counter instead of rescanning the package.
+
+    python-pptx's next_partname() walks every part in the package on each call,
+    and it runs once per notes slide, so a deck with speaker notes on every
+    slide grows quadratically. Parts are never removed while a deck is being
+    built, so one past the highest index seen for a template is always free.
+    """
+    package = prs.part.package
+    counters = {}
+
+    def next_partname(tmpl: str) -> PackURI:
+        idx = counters.get(tmpl)
+        if idx is None:
+            prefix = tmpl[: (tmpl % 42).find("42")]
+            idx = max(
+                (part.partname.idx or 0 for part in package.iter_parts() if part.partname.startswith(prefix)),
+                default=0
+            )
+        counters[tmpl] = idx + 1
+        return PackURI(tmpl % (idx + 1))
+
+    package.next_partname = next_partname
+
+
+_STATVFS = getattr(os, 'statvfs', None)  # Unix systems only
+_MIN_FREE_BYTES = 10 * 1024 * 1024
+_SPACE_CHECK_INTERVAL = 5.0  # Seconds a passing check stays valid for a directory
+_space_checked_at: Dict[str, float] = {}
+
+
+def _check_disk_space(directory: Path) -> None:
+    """Raise IOError below 10MB free, at most one statvfs per directory every few seconds"""
+    if _STATVFS is None:
+        return
+    key = str(directory)
+    now = time.monotonic()
+    last = _space_checked_at.get(key)
+    if last is not None and now - last < _SPACE_CHECK_INTERVAL:
+        return
+    stat = _STATVFS(directory)
+    if stat.f_frsize * stat.f_bavail < _MIN_FREE_BYTES:
+        raise IOError("Insufficient disk space")
+    _space_checked_at[key] = now
+
+
+# Characters rejected by common filesystems, plus whitespace, map to '_'
+_FILENAME_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*' + ' \t\n\r\v\f'})
+
+
+@lru_cache(maxsize=1024)
+def _sanitize_filename(filename: str, max_length: int) -> str:
+    """Pure string transform behind SafeFilename.sanitize, cached for repeated titles"""
+    # Non-ASCII letters are kept; a title like '日本' must not collapse to the fallback
+    filename = filename.strip().translate(_FILENAME_TABLE)[:max_length]
+    return filename or "presentation"
+
+
+class SafeFilename:
+    """Helpers for turning user-supplied titles into safe file names"""
+
+    @staticmethod
+    def sanitize(filename: str, max_length: int = 100) -> str:
+        """Replace unsafe characters in a single translate pass and cap the length"""
+        return _sanitize_filename(filename, max_length)
 
 
 # === LOGGING SETUP ===
 
+_LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'CRITICAL': logging.CRITICAL
+}
+_LOGGER: Optional[logging.Logger] = None
+
+
+def setup_logging(log_level: str = 'INFO') -> logging.Logger:
+    """Configure the converter logger once and hand back the same instance afterwards"""
+    global _LOGGER
+    if _LOGGER is not None:
+        return _LOGGER
+
+    logger = logging.getLogger("pptgen")
+    logger.setLevel(_LEVELS[log_level.upper()])
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        # Timestamps cost a strftime per record; only pay for them when debugging
+        if logger.level <= logging.DEBUG:
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        else:
+            handler.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+        logger.addHandler(handler)
+
+    _LOGGER = logger
+    return logger
+
+
 class PowerPointGenerator:
     """Enhanced PowerPoint generation with advanced features"""
     
     def __init__(self, config: Config, logger: logging.Logger):
-        self.speaker_notes_txt = [] 
-        self.notes_seen = set()
+        # (slide number, note) -> None; an insertion-ordered set of unique notes
+        self.speaker_notes: Dict[Tuple[int, str], None] = {}
         self.config = config
         self.logger = logger
         self.slide_count = 0
+        self._content_layout = None  # Title and Content layout of the deck being built
+        # Element name -> handler(prs, element, text, current_slide, content_box) -> (slide, content_box).
+        # <p> is not dispatched; see _handle_paragraph_element.
+        self._dispatch = {
+            **dict.fromkeys(("h1", "h2", "h3", "h4", "h5", "h6"), self._handle_heading),
+            **dict.fromkeys(("ol", "ul"), self._handle_list),
+            "table": self._handle_table,
+            **dict.fromkeys(("pre", "code"), self._handle_code),
+        }
     
     def create_enhanced_presentation(self, content_div: Tag, output_path: Path, title: str = None) -> bool:
         """Create PowerPoint with enhanced features and error handling"""
         try:
-            prs = Presentation()
-            
-            self._set_default_fonts(prs)
+            prs = _new_presentation()
+            self._content_layout = prs.slide_layouts[1]  # Looked up once per deck, not per slide
 
             # Add title slide
-            # Manually extract first heading/subheading/speaker notes
-            elements = content_div.find_all(["h1", "h2", "p"], recursive=True)
-            for el in elements:
-                if el.name == "p" and re.search(r"speaker notes\s*:", el.get_text(), flags=re.IGNORECASE):
-                    break  # Prevents same speaker note being parsed again later
+            # Manually extract first heading/subheading/speaker notes. The title pass and
+            # the content pass share one walk of the tree: anything the title pass does
+            # not take is handed on to the content pass ahead of the unread elements.
+            elements = self._iter_content_elements(content_div)
+            passed_over = []
             heading = None
             subheading = None
             speaker_notes = None
             
-            for i, el in enumerate(elements):
+            for item in elements:
+                el = item[0]
+                if el.name not in ("h1", "h2", "p"):
+                    passed_over.append(item)
+                    continue
                 text = el.get_text(strip=True)
             
                 # Remove "Slide x:" prefix if present
-                text = re.sub(r'^slide\s*\d+\s*:\s*', '', text, flags=re.IGNORECASE)
-            
-                # Detect speaker notes first
-                if re.search(r"speaker notes\s*:\s*", text, flags=re.IGNORECASE):
-                    _, notes = re.split(r"speaker notes\s*:\s*", text, flags=re.IGNORECASE, maxsplit=1)
-                    speaker_notes = notes.strip()
-                    el.decompose()
-                    continue
+                text = _SLIDE_PREFIX_RE.sub('', text)
             
-                # Assign heading and subheading next
-                if not heading:
+                # Detect speaker notes first, then assign heading and subheading
+                parts = _SPEAKER_NOTES_RE.split(text, maxsplit=1)
+                if len(parts) > 1:
+                    speaker_notes = parts[1].strip()
+                elif not heading:
                     heading = text
-                    elements[i].decompose()
                 elif not subheading:
                     subheading = text
-                    elements[i].decompose()
+                else:
+                    passed_over.append(item)
+                    continue
+                # Decompose right away: the walk then never yields this element's
+                # descendants, so they cannot leak into the content pass
+                el.decompose()
             
-                # Once both are found, break
+                # Stop as soon as all three are found, leaving the rest of the walk unread
                 if heading and subheading and speaker_notes:
                     break
                         
@@ -94,7 +306,7 @@ class PowerPointGenerator:
 
             
             # Process content elements
-            self._process_content_elements(prs, content_div)
+            self._process_content_elements(prs, chain(passed_over, elements))
             
             # Ensure we have at least one slide
             if len(prs.slides) == 0:
@@ -102,16 +314,18 @@ class PowerPointGenerator:
             
             # Save with error handling
             self._save_presentation(prs, output_path)
+            slide_total = len(prs.slides)
+            del prs  # Release the part tree (and any image blobs) before the notes file is written
 
-            if self.speaker_notes_txt:
-                self._save_speaker_notes_textfile(output_path, self.speaker_notes_txt)
+            if self.speaker_notes:
+                self._save_speaker_notes_textfile(output_path, self.speaker_notes)
 
-            self.logger.info(f"✅ PowerPoint created with {len(prs.slides)} slides: {output_path}")
+            self.logger.info("✅ PowerPoint created with %d slides: %s", slide_total, output_path)
             
             return True
             
         except Exception as e:
-            self.logger.error(f"PowerPoint generation failed: {e}")
+            self.logger.error("PowerPoint generation failed: %s", e)
             return False
     def add_custom_title_slide(self, prs: Presentation, heading: str, subheading: str, speaker_notes: str) -> None:
         try:
@@ -119,77 +333,57 @@ class PowerPointGenerator:
             slide = prs.slides.add_slide(title_slide_layout)
     
             slide.shapes.title.text = heading or ""
-            clean_subheading = re.sub(r'^subtitle\s*:\s*', '', subheading, flags=re.IGNORECASE).strip()
+            clean_subheading = _SUBTITLE_PREFIX_RE.sub('', subheading).strip()
             if len(slide.placeholders) > 1:
                  slide.placeholders[1].text = clean_subheading or ""
 
-            # Add speaker notes
+            # Add speaker notes; blank notes would only create an empty notes part
+            speaker_notes = speaker_notes.strip()
             if speaker_notes:
-                notes_slide = slide.notes_slide
-                notes_slide.notes_text_frame.text = speaker_notes.strip()
-                slide_index = prs.slides.index(slide)
-                notes_key = (slide_index + 1, speaker_notes.strip())  # 1-based slide number
-                if notes_key not in self.notes_seen and speaker_notes.strip():
-                   self.notes_seen.add(notes_key)
-                   self.speaker_notes_txt.append(notes_key)
+                slide.notes_slide.notes_text_frame.text = speaker_notes
+                # The slide was just appended, so its 1-based number is the slide count
+                self.speaker_notes.setdefault((len(prs.slides), speaker_notes), None)
 
             self.slide_count += 1
         except Exception as e:
-            self.logger.warning(f"Failed to add custom title slide: {e}")
+            self.logger.warning("Failed to add custom title slide: %s", e)
 
     
     
-    def _process_content_elements(self, prs: Presentation, content_div: Tag) -> None:
+    def _process_content_elements(self, prs: Presentation, elements: Iterable[Tuple[Tag, bool, bool, bool, bool]]) -> None:
         """Process all content elements with enhanced handling"""
         current_slide = None
         content_box = None
         
-        # Get all relevant elements in document order
-        elements = content_div.find_all([
-            "h1", "h2", "h3", "h4", "h5", "h6",
-            "p", "ul", "ol", "table", "pre", "code",
-            "blockquote", "img", "span","div"
-        ], recursive=True)
-        
         code_buffer = []
-        processed_elements = set()  # Track processed elements to avoid duplicates
+        code_length = 0  # Characters buffered so far, capped at max_slide_content_length
     
-        for element in elements:
-            # Skip if already processed
-            element_id = id(element)
-            if element_id in processed_elements:
-                continue
-                
+        for element, in_list, in_p, in_pre, in_code_host in elements:
             element_text = element.get_text(strip=True)
-            print(f"[DEBUG] Element text: {repr(element_text)}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Element %s: %r", element.name, element_text)
 
             # Handle speaker notes
-            # Handle speaker notes
-            match = re.search(r"speaker notes\s*:\s*", element_text, flags=re.IGNORECASE)
-            if match:
-                content_part, notes_part = re.split(r"speaker notes\s*:\s*", element_text, flags=re.IGNORECASE, maxsplit=1)
+            parts = _SPEAKER_NOTES_RE.split(element_text, maxsplit=1)
+            if len(parts) > 1:
+                notes = parts[1].strip()
             
-                # If we have a current slide, add notes to it
-                if current_slide is not None:
-                    slide = current_slide
-                    notes_slide = slide.notes_slide
-                    notes_key = (self.slide_count, notes_part.strip())
-                    if notes_part.strip() and notes_key not in self.notes_seen:
-                           self.notes_seen.add(notes_key)
-                           self.speaker_notes_txt.append(notes_key)
-                           notes_slide.notes_text_frame.text = notes_part.strip()
+                # If we have a current slide, add notes to it. notes_slide creates the
+                # notes part on first access, so only touch it for notes being written.
+                if current_slide is not None and notes:
+                    notes_key = (self.slide_count, notes)
+                    if notes_key not in self.speaker_notes:
+                        self.speaker_notes[notes_key] = None
+                        current_slide.notes_slide.notes_text_frame.text = notes
                 
-                # Mark as processed and skip this element entirely
-                processed_elements.add(element_id)
                 continue  # Skip the rest of the processing for this element
             
             # Handle consecutive cm-line blocks as one code block
             if element.name == "div" and "cm-line" in element.get("class", []):
-                print(f"[DEBUG] Detected cm-line: {element.get_text(strip=True)}")
-                code_text = element.get_text(strip=True)
-                if code_text:
-                    code_buffer.append(code_text)
-                processed_elements.add(element_id)
+                # Lines past the slide content limit would be truncated on flush anyway
+                if element_text and code_length < self.config.max_slide_content_length:
+                    code_buffer.append(element_text)
+                    code_length += len(element_text) + 1
                 continue
             
             # If the current element is NOT a cm-line AND we have code buffered, flush it
@@ -197,76 +391,72 @@ class PowerPointGenerator:
                 current_slide, content_box = self._ensure_slide(prs, current_slide, "Content")
                 self._add_code_content(content_box, "\n".join(code_buffer))
                 code_buffer = []
+                code_length = 0
             
             # Skip elements that are part of other elements to avoid duplication
-            if element.name in ["p", "span"] and element.find_parents(["ul", "ol", "li"]):
-                processed_elements.add(element_id)
-                continue
-            
-            if element.name == "p" and element.find_parent("li"):
-                processed_elements.add(element_id)
+            if element.name in ("p", "span") and in_list:
                 continue
             
-            if element.name == "span" and (element.find_parent("p") or element.find_parent("li")):
-                processed_elements.add(element_id)
+            if element.name == "span" and in_p:
                 continue
     
-            # Skip <code> if it's inside a <pre>
-            if element.name == "code" and element.find_parent("pre"):
-                processed_elements.add(element_id)
+            # <pre> renders its own <code>; otherwise only a fenced block, i.e. a <code>
+            # that is the sole child of a top-level <p>, becomes a code paragraph
+            if element.name == "code" and (in_pre or in_list or in_code_host or not _is_fenced_code(element)):
                 continue
-    
-            try:
-                element_type = element.name
-                
-                # Handle headings - create new slides
-                if element_type in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-                    current_slide, content_box = self._add_content_slide(prs, element.get_text(strip=True))
-                
-                # Handle lists
-                elif element_type in ["ol", "ul"] and not element.find_parent(["ul", "ol"]):
-                    current_slide, content_box = self._ensure_slide(prs, current_slide, "List")
-                    self._add_list_content(content_box, element)
-                    processed_elements.add(element_id)
-                    continue
 
-                # elif element.name == "p":
-                #    current_slide, content_box = self._handle_paragraph_element(prs, element, current_slide, content_box)
-                #    continue
+            # Nested lists are rendered by their top-level list
+            if element.name in _NESTED_LIST_TAGS and in_list:
+                continue
 
-                # Handle tables
-                elif element_type == "table":
-                   current_slide, content_box = self._ensure_slide(prs, current_slide, "Content")
-                   self._add_table_to_slide(current_slide, element)
-                   processed_elements.add(element_id)
-                   continue
-                
-                # Handle code blocks
-                elif element_type in ["pre", "code"]:
-                    current_slide, content_box = self._ensure_slide(prs, current_slide, "Code")
-                    self._add_code_content(content_box, element)
-                    continue
-                # Mark as processed
-                processed_elements.add(element_id)
-                    
+            handler = self._dispatch.get(element.name)
+            if handler is None:
+                continue
+            try:
+                current_slide, content_box = handler(prs, element, element_text, current_slide, content_box)
             except Exception as e:
-                self.logger.warning(f"Failed to process element {element_type}: {e}")
-                processed_elements.add(element_id)
+                self.logger.warning("Failed to process element %s: %s", element.name, e)
                 continue
             
-            # Handle any remaining code buffer
-            if code_buffer:
-                current_slide, content_box = self._ensure_slide(prs, current_slide, "Content")
-                self._add_code_content(content_box, "\n".join(code_buffer))
+        # Handle any remaining code buffer
+        if code_buffer:
+            current_slide, content_box = self._ensure_slide(prs, current_slide, "Content")
+            self._add_code_content(content_box, "\n".join(code_buffer))
+
+    def _iter_content_elements(self, content_div: Tag) -> Iterator[Tuple[Tag, bool, bool, bool, bool]]:
+        """Yield (element, in_list, in_p, in_pre, in_code_host) for every content tag in document order.
+
+        The ancestor flags travel down an explicit stack, so deciding whether an
+        element is nested inside a list, paragraph, <pre>, heading or table cell
+        is O(1) instead of a find_parent() walk back up the tree for each element.
+        Children are read only after the consumer has seen a node, so a node it
+        decomposes contributes no descendants.
+        """
+        stack = [(child, False, False, False, False) for child in reversed(content_div.contents)]
+        while stack:
+            node, in_list, in_p, in_pre, in_code_host = stack.pop()
+            if not isinstance(node, Tag):
+                continue
+            name = node.name
+            child_flags = (
+                in_list or name in _LIST_TAGS,
+                in_p or name == "p",
+                in_pre or name == "pre",
+                in_code_host or name in _CODE_HOST_TAGS
+            )
+            if name in _CONTENT_TAGS:
+                yield node, in_list, in_p, in_pre, in_code_host
+            stack.extend((child, *child_flags) for child in reversed(node.contents))
 
     def _add_content_slide(self, prs: Presentation, title: str) -> Tuple[Any, Any]:
         """Add a new content slide and apply custom formatting to the body placeholder"""
-        slide_layout = prs.slide_layouts[1]  # Title and Content layout
-        slide = prs.slides.add_slide(slide_layout)
+        slide = prs.slides.add_slide(self._content_layout)
     
         # Clean the title and set it
-        clean_title = re.sub(r'^slide\s*\d+\s*:\s*', '', title, flags=re.IGNORECASE)
-        slide.shapes.title.text = clean_title[:100] + "..." if len(clean_title) > 100 else clean_title
+        clean_title = _SLIDE_PREFIX_RE.sub('', title)
+        if len(clean_title) > _MAX_TITLE_LENGTH:
+            clean_title = clean_title[:_MAX_TITLE_LENGTH - 3] + "..."
+        slide.shapes.title.text = clean_title
     
         # Get the body placeholder
         content_box = slide.placeholders[1]
@@ -274,21 +464,21 @@ class PowerPointGenerator:
         text_frame.clear()
     
         # Apply custom shape settings from the screenshot
-        content_box.left = Cm(1.27)
-        content_box.top = Cm(5.28)
-        content_box.width = Cm(16.13)
-        content_box.height = Cm(8.48)
+        content_box.left = _BODY_LEFT
+        content_box.top = _BODY_TOP
+        content_box.width = _BODY_WIDTH
+        content_box.height = _BODY_HEIGHT
     
         text_frame.word_wrap = True
         text_frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE
         text_frame.vertical_anchor = MSO_VERTICAL_ANCHOR.TOP
-        text_frame.margin_left = Cm(0.25)
-        text_frame.margin_right = Cm(0.25)
-        text_frame.margin_top = Cm(0.13)
-        text_frame.margin_bottom = Cm(0.13)
+        text_frame.margin_left = _BODY_MARGIN_X
+        text_frame.margin_right = _BODY_MARGIN_X
+        text_frame.margin_top = _BODY_MARGIN_Y
+        text_frame.margin_bottom = _BODY_MARGIN_Y
     
         self.slide_count += 1
-        return slide, text_frame
+        return slide, content_box
     
     def _ensure_slide(self, prs: Presentation, current_slide: Any, default_title: str) -> Tuple[Any, Any]:
         """Ensure we have a slide to work with"""
@@ -299,23 +489,44 @@ class PowerPointGenerator:
         content_box = current_slide.placeholders[1]
         return current_slide, content_box
     
-    def _handle_paragraph_element(self, prs: Presentation, element: Tag, current_slide: Any, content_box: Any) -> Tuple[Any, Any]:
+    def _handle_heading(self, prs: Presentation, element: Tag, text: str, current_slide: Any, content_box: Any) -> Tuple[Any, Any]:
+        """Headings start a new slide"""
+        return self._add_content_slide(prs, text)
+
+    def _handle_list(self, prs: Presentation, element: Tag, text: str, current_slide: Any, content_box: Any) -> Tuple[Any, Any]:
+        """Top-level <ul>/<ol> go into the current slide's body"""
+        current_slide, content_box = self._ensure_slide(prs, current_slide, "List")
+        self._add_list_content(content_box, element)
+        return current_slide, content_box
+
+    def _handle_table(self, prs: Presentation, element: Tag, text: str, current_slide: Any, content_box: Any) -> Tuple[Any, Any]:
+        """Tables are added as table shapes on the current slide"""
+        current_slide, content_box = self._ensure_slide(prs, current_slide, "Content")
+        self._add_table_to_slide(current_slide, element)
+        return current_slide, content_box
+
+    def _handle_code(self, prs: Presentation, element: Tag, text: str, current_slide: Any, content_box: Any) -> Tuple[Any, Any]:
+        """<pre> and standalone <code> become monospace paragraphs"""
+        current_slide, content_box = self._ensure_slide(prs, current_slide, "Code")
+        self._add_code_content(content_box, text)
+        return current_slide, content_box
+
+    def _handle_paragraph_element(self, prs: Presentation, element: Tag, text: str, current_slide: Any, content_box: Any) -> Tuple[Any, Any]:
         """Handle standalone <p> elements not part of lists"""
-        if not element.get_text(strip=True):
+        if not text:
             return current_slide, content_box
     
         current_slide, content_box = self._ensure_slide(prs, current_slide, "Content")
-        self._add_paragraph_content(content_box, element)
+        self._add_paragraph_content(content_box, text)
         return current_slide, content_box
 
-    def _add_paragraph_content(self, content_box: Any, element: Tag) -> None:
+    def _add_paragraph_content(self, content_box: Any, text: str) -> None:
         """Add paragraph with smart formatting"""
-        print("Para content being called")
-        text = element.get_text(strip=True)
+        self.logger.debug("Adding paragraph content")
         if not text or len(text) > self.config.max_slide_content_length:
             return
         if "speaker notes:" in text.lower():
-           content_part, notes_part = re.split(r'speaker notes\s*:\s*', text, flags=re.IGNORECASE, maxsplit=1)
+           content_part, notes_part = _SPEAKER_NOTES_RE.split(text, maxsplit=1)
            text = content_part.strip()
        
            # Add speaker notes to the slide
@@ -323,8 +534,7 @@ class PowerPointGenerator:
            notes_slide.notes_text_frame.text = notes_part.strip()
 
         # Check if this looks like a bullet point
-        bullet_patterns = [r'^\s*[-•·]\s+', r'^\s*\d+\.\s+', r'^\s*[a-zA-Z]\.\s+']
-        is_bullet = any(re.match(pattern, text) for pattern in bullet_patterns)
+        is_bullet = _BULLET_RE.match(text) is not None
         
         para = content_box.text_frame.add_paragraph()
         para.text = text
@@ -340,90 +550,84 @@ class PowerPointGenerator:
     def _process_list_recursive(self, content_box: Any, list_element: Tag, level: int) -> None:
         """Process lists recursively with proper nesting"""
         max_level = 4  # PowerPoint limitation
-        print("rec list being called")
-        if len(content_box.text_frame.paragraphs) == 1 and not content_box.text_frame.paragraphs[0].text.strip():
-            p = content_box.text_frame.paragraphs[0]
-            content_box.text_frame._element.remove(p._element)
+        text_frame = content_box.text_frame
+        # Drop the placeholder's lone empty paragraph once; every item below is appended
+        paragraphs = text_frame.paragraphs
+        if len(paragraphs) == 1 and not paragraphs[0].text.strip():
+            text_frame._element.remove(paragraphs[0]._element)
         for li in list_element.find_all("li", recursive=False):
             try:
                 # Get text content, excluding nested lists
-                text_parts = []
-                for item in li.children:
-                    if isinstance(item, NavigableString):
-                        text_parts.append(str(item).strip())
-                    elif isinstance(item, Tag) and item.name not in ["ul", "ol"]:
-                        text_parts.append(item.get_text(" ", strip=True))
-                
-                text = " ".join(text_parts).strip()
+                nested_lists = li.find_all(["ul", "ol"], recursive=False)
+                if not nested_lists:
+                    # Common case: let BeautifulSoup collect the text directly
+                    text = li.get_text(" ", strip=True)
+                else:
+                    text_parts = []
+                    for item in li.children:
+                        if isinstance(item, NavigableString):
+                            part = item.strip()
+                        elif isinstance(item, Tag) and item.name not in _NESTED_LIST_TAGS:
+                            part = item.get_text(" ", strip=True)
+                        else:
+                            continue
+                        if part:
+                            text_parts.append(part)
+                    text = " ".join(text_parts)
                 if text:
-                    if len(content_box.text_frame.paragraphs) == 1 and not content_box.text_frame.paragraphs[0].text.strip():
-                        para = content_box.text_frame.paragraphs[0]
-                    else:
-                        para = content_box.text_frame.add_paragraph()
-                    para.text = text
-                    para.level = min(level, max_level)
-                    para.space_before = Pt(0)
-                    para.space_after = Pt(0)
-                    para.margin_left = Pt(0)
-                    para.left_indent = Pt(0)
-
-                    self._set_font_safely(para, text, 'default')
+                    self._append_paragraph(text_frame, text, min(level, max_level), 'default', tight=True)
                 
                 # Process nested lists
-                nested_lists = li.find_all(["ul", "ol"], recursive=False)
                 for nested in nested_lists:
                     self._process_list_recursive(content_box, nested, level + 1)
                     
             except Exception as e:
-                self.logger.debug(f"List item processing failed: {e}")
+                self.logger.debug("List item processing failed: %s", e)
         # ✅ Trigger shrink-to-fit for bullet list after all items are added
-        content_box.text_frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE
+        text_frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE
 
     def _add_table_to_slide(self, slide: Any, table_element: Tag) -> None:
         """Insert table into an existing slide"""
         try:
-            rows = table_element.find_all("tr")
-            if not rows:
-                return
+            # Collect each row's cells once; rows without any cells are dropped
+            rows_cells = [row.find_all(["td", "th"]) for row in table_element.find_all("tr")]
+            rows_cells = [cells for cells in rows_cells if cells]
             
             # Calculate table dimensions
-            max_cols = max(len(row.find_all(["td", "th"])) for row in rows if row.find_all(["td", "th"]))
-            num_rows = len(rows)
+            max_cols = max(map(len, rows_cells), default=0)
+            num_rows = len(rows_cells)
             
             if max_cols == 0 or num_rows == 0:
                 return
             
             # Table dimensions and positioning
-            left = Inches(0.5)
-            top = Inches(1.77)  # Position below title or existing content
-            width = Inches(9)
+            left = _TABLE_LEFT
+            top = _TABLE_TOP  # Position below title or existing content
+            width = _TABLE_WIDTH
             height = Inches(min(5.5, 0.5 + 0.4 * num_rows))
             
             # Create table
             table_shape = slide.shapes.add_table(num_rows, max_cols, left, top, width, height)
             table = table_shape.table
             
-            for i, row in enumerate(rows):
-                cells = row.find_all(["td", "th"])
-                is_header = any(cell.name == "th" for cell in cells)
+            for i, cells in enumerate(rows_cells):
+                is_header = i == 0 and any(cell.name == "th" for cell in cells)
                 
                 for j in range(max_cols):
-                    cell_text = ""
-                    if j < len(cells):
-                        cell_text = cells[j].get_text(strip=True)
-                    
                     cell = table.cell(i, j)
-                    cell.text = cell_text[:200]
+                    # Cells missing from short rows are already empty
+                    if j < len(cells):
+                        cell.text = cells[j].get_text(strip=True)[:200]
                     
-                    if is_header and i == 0:
+                    if is_header:
                         cell.fill.solid()
-                        cell.fill.fore_color.rgb = RGBColor(68, 114, 196)
+                        cell.fill.fore_color.rgb = _HEADER_FILL
                         for paragraph in cell.text_frame.paragraphs:
                             for run in paragraph.runs:
-                                run.font.color.rgb = RGBColor(255, 255, 255)
+                                run.font.color.rgb = _HEADER_TEXT
                                 run.font.bold = True
         except Exception as e:
-            self.logger.warning(f"Table insertion failed: {e}")
+            self.logger.warning("Table insertion failed: %s", e)
 
     
     def _add_code_content(self, content_box: Any, code_text: str) -> None:
@@ -431,27 +635,13 @@ class PowerPointGenerator:
         if not code_text.strip():
             return
     
-        para = content_box.text_frame.add_paragraph()
-        para.text = code_text[:self.config.max_slide_content_length]
-        para.level = 0  # Make sure it's top-level
-    
-        # 🔧 Safely remove bullets
-        pPr = para._element.get_or_add_pPr()
-        for bullet_tag in ['a:buAutoNum', 'a:buChar', 'a:buNone']:
-            tag = pPr.find(qn(bullet_tag))
-            if tag is not None:
-                pPr.remove(tag)
-    
-        # ⛑️ Add bullet=None explicitly (if using a style that enforces bullets)
-        buNone = OxmlElement('a:buNone')
-        pPr.append(buNone)
-    
-        self._set_font_safely(para, code_text, 'code')
+        # Top-level paragraph with bullet=None explicitly (if using a style that enforces bullets)
+        self._append_paragraph(content_box.text_frame, code_text[:self.config.max_slide_content_length],
+                               0, 'code', no_bullet=True)
 
     
-    def _add_quote_content(self, content_box: Any, element: Tag) -> None:
+    def _add_quote_content(self, content_box: Any, quote_text: str) -> None:
         """Add blockquote with special formatting"""
-        quote_text = element.get_text(strip=True)
         if not quote_text:
             return
         
@@ -475,7 +665,7 @@ class PowerPointGenerator:
     #     para.text = f"Formula: {math_text}"
         
     #     try:
-    #         para.font.name = self.config.font_fallbacks['math']
+    #         para.font.name = self.config.font_fallbacks.math
     #         para.font.size = Pt(26)
     #     except Exception:
     #         pass
@@ -485,68 +675,65 @@ class PowerPointGenerator:
     #     class_names = element.get("class", [])
     #     return any("katex" in str(cls).lower() or "math" in str(cls).lower() for cls in class_names)'''
     
-    # def _get_appropriate_font(self, text: str) -> str:
-    #     """Get appropriate font based on text content"""
-    #     # Check for non-ASCII characters (might need special font handling)
-    #     if any(ord(c) > 127 for c in text):
-    #         return self.config.font_fallbacks['fallback']
-        
-    #     # Check for code-like content
-    #     if re.search(r'[{}();=<>]', text) and len(text.split()) < 10:
-    #         return self.config.font_fallbacks['code']
-        
-    #     return self.config.font_fallbacks['default']
+    def _get_appropriate_font(self, text: str) -> str:
+        """Get appropriate font based on text content"""
+        return _pick_font(text, self.config.font_fallbacks)
     
     def _add_fallback_slide(self, prs: Presentation, title: str, content: str) -> None:
         """Add fallback slide when no content is found"""
-        slide_layout = prs.slide_layouts[1]
-        slide = prs.slides.add_slide(slide_layout)
+        slide = prs.slides.add_slide(self._content_layout)
         slide.shapes.title.text = title
         slide.placeholders[1].text = content
         self.slide_count += 1
 
+    def _resolve_font(self, text_content, font_type='default'):
+        """Pick font name and size for a font type, falling back to Arial 22pt"""
+        try:
+            if font_type == 'code':
+                return self.config.font_fallbacks.code, _FONT_SIZE_CODE
+            if font_type == 'heading':
+                return self.config.font_fallbacks.default, _FONT_SIZE_HEADING
+            return self._get_appropriate_font(text_content), _FONT_SIZE_DEFAULT
+        except Exception as e:
+            self.logger.warning("Font setting failed for '%.50s...': %s", text_content, e)
+            return self.config.font_fallbacks.fallback, _FONT_SIZE_FALLBACK
+
+    def _append_paragraph(self, text_frame: Any, text: str, level: int = 0, font_type: str = 'default',
+                          tight: bool = False, no_bullet: bool = False) -> None:
+        """Build a complete a:p (pPr, font, runs) in lxml and attach it with one append"""
+        font_name, font_size = self._resolve_font(text, font_type)
+        p = OxmlElement('a:p')
+        pPr = SubElement(p, _A_PPR)
+        if level:
+            pPr.set('lvl', str(level))
+        if tight:
+            SubElement(SubElement(pPr, _A_SPC_BEF), _A_SPC_PTS, val='0')
+            SubElement(SubElement(pPr, _A_SPC_AFT), _A_SPC_PTS, val='0')
+        if no_bullet:
+            SubElement(pPr, _A_BU_NONE)
+        defRPr = SubElement(pPr, _A_DEF_RPR, sz=str(font_size.centipoints))
+        SubElement(defRPr, _A_LATIN, typeface=font_name)
+        p.append_text(text)
+        text_frame._txBody.append(p)
+
     def _set_font_safely(self, paragraph, text_content, font_type='default'):
         """Safely set font with proper error handling and logging"""
         try:
-            if font_type == 'code':
-                font_name = self.config.font_fallbacks['code']
-                font_size = Pt(20)
-            elif font_type == 'heading':
-                font_name = self.config.font_fallbacks['calibri']
-                font_size = Pt(28)
-            else:
-                font_name = self._get_appropriate_font(text_content)
-                font_size = Pt(24)
-            
+            font_name, font_size = self._resolve_font(text_content, font_type)
             paragraph.font.name = font_name
             paragraph.font.size = font_size
             
-            self.logger.debug(f"Font set successfully: {font_name}, {font_size}")
+            self.logger.debug("Font set successfully: %s, %s", font_name, font_size)
             
         except Exception as e:
-            self.logger.warning(f"Font setting failed for '{text_content[:50]}...': {e}")
+            self.logger.warning("Font setting failed for '%.50s...': %s", text_content, e)
             # Try fallback
             try:
-                paragraph.font.name = 'Arial'
-                paragraph.font.size = Pt(22)
+                paragraph.font.name = self.config.font_fallbacks.fallback
+                paragraph.font.size = _FONT_SIZE_FALLBACK
             except Exception as fallback_error:
-                self.logger.error(f"Even fallback font failed: {fallback_error}")
+                self.logger.error("Even fallback font failed: %s", fallback_error)
     
-    def _set_default_fonts(self, prs: Presentation):
-        """Set consistent default fonts across all slide layouts"""
-        try:
-            for layout in prs.slide_layouts:
-                for placeholder in layout.placeholders:
-                    if hasattr(placeholder, 'text_frame'):
-                        for paragraph in placeholder.text_frame.paragraphs:
-                            try:
-                                paragraph.font.name = self.config.font_fallbacks['default']
-                                paragraph.font.size = Pt(22)
-                            except:
-                                continue
-        except Exception as e:
-            self.logger.debug(f"Default font setting failed: {e}")
-
     def _save_presentation(self, prs: Presentation, output_path: Path) -> None:
         """Save presentation with comprehensive error handling"""
         try:
@@ -554,14 +741,17 @@ class PowerPointGenerator:
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Check available disk space (basic check)
-            if hasattr(os, 'statvfs'):  # Unix systems
-                stat = os.statvfs(output_path.parent)
-                available_space = stat.f_frsize * stat.f_bavail
-                if available_space < 10 * 1024 * 1024:  # Less than 10MB
-                    raise IOError("Insufficient disk space")
+            _check_disk_space(output_path.parent)
             
-            # Save presentation
-            prs.save(str(output_path))
+            # Save to a sibling temp file and swap it in, so a failed save never
+            # leaves a truncated deck at output_path
+            tmp_path = output_path.with_name(output_path.name + ".tmp")
+            try:
+                prs.save(str(tmp_path))
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
             
         except PermissionError:
             raise IOError(f"Permission denied: Cannot write to {output_path}")
@@ -569,25 +759,14 @@ class PowerPointGenerator:
             raise IOError(f"File system error: {e}")
     
     
-    def _save_speaker_notes_textfile(self, ppt_path: Path, speaker_notes_list: List[Tuple[int, str]]) -> None:
+    def _save_speaker_notes_textfile(self, ppt_path: Path, speaker_notes: Dict[Tuple[int, str], None]) -> None:
         """Save speaker notes to a text file with spacing between slides"""
         try:
             textfile_path = ppt_path.with_name(ppt_path.stem + "_speaker_notes.txt")
+            # Keys are already unique, stripped and non-empty; write them in one call
+            text = "".join(f"Slide {slide_number}:\n{notes}\n\n" for slide_number, notes in speaker_notes)
             with open(textfile_path, "w", encoding="utf-8") as f:
-                # ✅ Remove duplicates and empty notes
-                cleaned_notes = []
-                seen = set()
-                
-                for slide_num, note in speaker_notes_list:
-                    note = note.strip()
-                    key = (slide_num, note)
-                    
-                    if note and key not in seen:
-                        seen.add(key)
-                        cleaned_notes.append((slide_num, note))
-
-                for slide_number, notes in cleaned_notes:
-                    f.write(f"Slide {slide_number}:\n{notes.strip()}\n\n")
-            self.logger.info(f"📝 Speaker notes text file saved: {textfile_path}")
+                f.write(text)
+            self.logger.info("📝 Speaker notes text file saved: %s", textfile_path)
         except Exception as e:
-            self.logger.error(f"Failed to save speaker notes text file: {e}")
\ No newline at end of file
+            self.logger.error("Failed to save speaker notes text file: %s", e)
\ No newline at end of file